@@ -1,7 +1,8 @@
 # backend/api/chat_logic.py
-import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
+import jiter
+import orjson
 from google import genai
 
 from config.settings import GEMINI_API_KEY, GEMINI_MODEL
@@ -14,6 +15,45 @@ if not GEMINI_API_KEY:
 client = genai.Client(api_key=GEMINI_API_KEY)
 
 
+# System instructions: describe 3 sections and constraints.
+# IMPORTANT: We tell Gemini to respond with JSON only.
+SYSTEM_INSTRUCTIONS = """
+You are an assistant that answers user questions strictly based on
+given bank policy documents and general banking knowledge.
+
+You MUST always respond as a JSON object with keys:
+  "summary": string            (Section 1A, policy-based)
+  "steps": string              (Section 1B, policy-based step-wise process)
+  "sources": array of objects  (Section 2)
+      Each object: { "bank": string, "document_name": string, "snippet": string }
+  "cost_saving_tips": string   (Section 3, general/online info allowed)
+
+Rules:
+- "summary" and "steps" MUST use ONLY the provided policy_context text.
+  Do NOT invent new rules or numbers.
+- If the context is incomplete or does not specify something, clearly say that.
+- For "steps", if the policy describes a process (e.g., account opening, loan application,
+  credit card application), give clear numbered steps based ONLY on the document content.
+- If the policy does NOT specify a clear process, say that and only explain what it does say.
+- "sources" must reflect which bank and which document were used, with short snippets
+  that are cleaned up but keep the same meaning as the original policy text.
+- "cost_saving_tips" may use general banking and online knowledge, but MUST clearly say
+  that this section is based on general/online information and not directly from the policy documents.
+- VERY IMPORTANT: Output MUST be a single JSON object only.
+  Do NOT write any text before or after the JSON.
+  Do NOT wrap the JSON in ``` or any other formatting.
+"""
+
+# Static prompt parts are built once; only the JSON payload changes per request.
+# Keeping the prefix byte-identical across calls also lets the provider reuse
+# its prefix cache.
+_PROMPT_PREFIX = (
+    SYSTEM_INSTRUCTIONS
+    + "\n\nHere is the data for this request as a JSON object:\n"
+)
+_PROMPT_SUFFIX = "\n\nNow produce the answer as a JSON object with the required keys."
+
+
 def build_context_block(retrieved_docs: List[Dict[str, Any]]) -> str:
     """
     Build a text block summarizing all relevant policy chunks.
@@ -24,19 +64,12 @@ def build_context_block(retrieved_docs: List[Dict[str, Any]]) -> str:
 
     ...
     """
-    parts: List[str] = []
-    for doc in retrieved_docs:
-        bank = doc["bank"]
-        document_name = doc["document_name"]
-        merged_text = doc["merged_text"]
-
-        part = (
-            f"[BANK: {bank}] [DOCUMENT: {document_name}]\n"
-            f"{merged_text}\n"
-            "----\n"
-        )
-        parts.append(part)
-    return "\n".join(parts)
+    return "\n".join(
+        f"[BANK: {doc['bank']}] [DOCUMENT: {doc['document_name']}]\n"
+        f"{doc['merged_text']}\n"
+        "----\n"
+        for doc in retrieved_docs
+    )
 
 
 def build_sources_for_llm(retrieved_docs: List[Dict[str, Any]]) -> List[Dict[str, str]]:
@@ -64,12 +97,7 @@ def _history_to_text(history: List[Dict[str, str]]) -> str:
     """
     Convert our stored chat history to a simple text block.
     """
-    lines = []
-    for msg in history:
-        role = msg["role"]
-        content = msg["content"]
-        lines.append(f"{role.upper()}: {content}")
-    return "\n".join(lines)
+    return "\n".join(f"{msg['role'].upper()}: {msg['content']}" for msg in history)
 
 
 def safe_parse_llm_json(raw: str) -> Dict[str, Any]:
@@ -77,7 +105,8 @@ def safe_parse_llm_json(raw: str) -> Dict[str, Any]:
     Try to robustly parse JSON coming from the LLM.
 
     - Strips markdown fences like ```json ... ```
-    - Tries to extract the first {...} block.
+    - Tries the first {...} block, then the tail from the first { with jiter,
+      tolerating truncated output.
     - Falls back to a minimal dict if parsing fails.
     """
     text = raw.strip()
@@ -92,23 +121,43 @@ def safe_parse_llm_json(raw: str) -> Dict[str, Any]:
             lines = lines[:-1]
         text = "\n".join(lines).strip()
 
-    # 2) Try direct json.loads
+    # 2) Try direct orjson.loads (only a JSON object is a usable answer)
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
+        parsed = orjson.loads(text)
+    except orjson.JSONDecodeError:
         pass
+    else:
+        if isinstance(parsed, dict):
+            return parsed
 
-    # 3) Try to extract the first {...} span
+    # 3) Try the first {...} span strictly (drops prose around the object)
     start = text.find("{")
     end = text.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        candidate = text[start : end + 1]
+    if start != -1 and end > start:
         try:
-            return json.loads(candidate)
-        except json.JSONDecodeError:
+            parsed = orjson.loads(text[start : end + 1])
+        except orjson.JSONDecodeError:
             pass
+        else:
+            if isinstance(parsed, dict):
+                return parsed
+
+    # 4) Parse the open-ended tail from the first "{" with jiter in partial
+    #    mode, which recovers truncated outputs. This must not run on the
+    #    span above: a truncated output can end that span at a "}" inside a
+    #    string value, which partial mode would accept and cut short.
+    if start != -1:
+        try:
+            parsed = jiter.from_json(
+                text[start:].encode(), partial_mode="trailing-strings"
+            )
+        except ValueError:
+            pass
+        else:
+            if isinstance(parsed, dict):
+                return parsed
 
-    # 4) Final fallback: wrap raw text into minimal structure
+    # 5) Final fallback: wrap raw text into minimal structure
     return {
         "summary": raw,
         "steps": "",
@@ -117,20 +166,14 @@ def safe_parse_llm_json(raw: str) -> Dict[str, Any]:
     }
 
 
-def generate_answer(
+def _build_prompt(
     question: str,
     bank: Optional[str],
     session_id: str,
     retrieved_docs: List[Dict[str, Any]],
-) -> Dict[str, Any]:
+) -> str:
     """
-    Call the LLM (Gemini) and return structured answer:
-    {
-      "summary": str,
-      "steps": str,
-      "sources": [...],
-      "cost_saving_tips": str
-    }
+    Build the full Gemini prompt: instructions + per-request JSON payload.
     """
     # Chat history for continuity
     history = session_store.get_history(session_id)
@@ -139,35 +182,6 @@ def generate_answer(
     sources_for_llm = build_sources_for_llm(retrieved_docs)
     history_text = _history_to_text(history)
 
-    # System instructions: describe 3 sections and constraints.
-    # IMPORTANT: We tell Gemini to respond with JSON only.
-    system_instructions = """
-You are an assistant that answers user questions strictly based on
-given bank policy documents and general banking knowledge.
-
-You MUST always respond as a JSON object with keys:
-  "summary": string            (Section 1A, policy-based)
-  "steps": string              (Section 1B, policy-based step-wise process)
-  "sources": array of objects  (Section 2)
-      Each object: { "bank": string, "document_name": string, "snippet": string }
-  "cost_saving_tips": string   (Section 3, general/online info allowed)
-
-Rules:
-- "summary" and "steps" MUST use ONLY the provided policy_context text.
-  Do NOT invent new rules or numbers.
-- If the context is incomplete or does not specify something, clearly say that.
-- For "steps", if the policy describes a process (e.g., account opening, loan application,
-  credit card application), give clear numbered steps based ONLY on the document content.
-- If the policy does NOT specify a clear process, say that and only explain what it does say.
-- "sources" must reflect which bank and which document were used, with short snippets
-  that are cleaned up but keep the same meaning as the original policy text.
-- "cost_saving_tips" may use general banking and online knowledge, but MUST clearly say
-  that this section is based on general/online information and not directly from the policy documents.
-- VERY IMPORTANT: Output MUST be a single JSON object only.
-  Do NOT write any text before or after the JSON.
-  Do NOT wrap the JSON in ``` or any other formatting.
-"""
-
     # Bundle everything into a single prompt string for Gemini
     user_payload = {
         "question": question,
@@ -177,12 +191,42 @@ Rules:
         "chat_history": history_text,
     }
 
-    prompt = (
-        system_instructions
-        + "\n\nHere is the data for this request as a JSON object:\n"
-        + json.dumps(user_payload, ensure_ascii=False)
-        + "\n\nNow produce the answer as a JSON object with the required keys."
-    )
+    return _PROMPT_PREFIX + orjson.dumps(user_payload).decode() + _PROMPT_SUFFIX
+
+
+def _shape_answer(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Coerce parsed LLM output into the answer structure the API returns.
+    """
+    # Ensure sources are in correct shape
+    sources = parsed.get("sources", [])
+    if not isinstance(sources, list):
+        sources = []
+
+    return {
+        "summary": parsed.get("summary", "").strip(),
+        "steps": parsed.get("steps", "").strip(),
+        "sources": sources,
+        "cost_saving_tips": parsed.get("cost_saving_tips", "").strip(),
+    }
+
+
+def generate_answer(
+    question: str,
+    bank: Optional[str],
+    session_id: str,
+    retrieved_docs: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    Call the LLM (Gemini) and return structured answer:
+    {
+      "summary": str,
+      "steps": str,
+      "sources": [...],
+      "cost_saving_tips": str
+    }
+    """
+    prompt = _build_prompt(question, bank, session_id, retrieved_docs)
 
     # --- Gemini call ---
     response = client.models.generate_content(
@@ -195,16 +239,51 @@ Rules:
     # print("Gemini raw response:", repr(content))
 
     # Robust JSON parsing
-    parsed = safe_parse_llm_json(content)
+    return _shape_answer(safe_parse_llm_json(content))
 
-    # Ensure sources are in correct shape
-    sources = parsed.get("sources", [])
-    if not isinstance(sources, list):
-        sources = []
 
-    return {
-        "summary": parsed.get("summary", "").strip(),
-        "steps": parsed.get("steps", "").strip(),
-        "sources": sources,
-        "cost_saving_tips": parsed.get("cost_saving_tips", "").strip(),
-    }
+def stream_answer(
+    question: str,
+    bank: Optional[str],
+    session_id: str,
+    retrieved_docs: List[Dict[str, Any]],
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream the LLM (Gemini) answer as ("partial", fields) / ("answer", answer) events.
+
+    While text arrives, the buffer is parsed with jiter in partial mode. Only
+    the last top-level key can still be in progress (an unfinished string,
+    array or object), so it is left out: each "partial" event carries just the
+    top-level fields the model has fully written (e.g. "summary" long before
+    "cost_saving_tips"). The last event is always ("answer", ...) with the
+    same shape as generate_answer().
+    """
+    prompt = _build_prompt(question, bank, session_id, retrieved_docs)
+
+    buf = ""
+    last_partial: Dict[str, Any] = {}
+    for chunk in client.models.generate_content_stream(
+        model=GEMINI_MODEL,
+        contents=prompt,
+    ):
+        buf += chunk.text or ""
+
+        start = buf.find("{")
+        if start == -1:
+            continue
+        try:
+            partial = jiter.from_json(
+                buf[start:].encode(), partial_mode="trailing-strings"
+            )
+        except ValueError:
+            # e.g. a closing ``` fence after the object; the final parse handles it
+            continue
+        if not isinstance(partial, dict):
+            continue
+        # Keys come back in document order; drop the one that may be unfinished
+        completed = dict(list(partial.items())[:-1])
+        if completed != last_partial:
+            last_partial = completed
+            yield "partial", completed
+
+    yield "answer", _shape_answer(safe_parse_llm_json(buf))
@@ -1,17 +1,29 @@
 # backend/api/main.py
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.sse import EventSourceResponse, ServerSentEvent
 
-from backend.api.models import QuestionRequest, AnswerResponse, SourceItem
+from backend.api.models import QuestionRequest, AnswerResponse, SourceItem, RootResponse
 from backend.api.session_store import session_store
 from backend.api.retrieval import retrieval_engine
-from backend.api.chat_logic import generate_answer
+from backend.api.chat_logic import generate_answer, stream_answer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the embedding model before serving, so the first /ask is not slow
+    retrieval_engine.warmup()
+    yield
 
 
 app = FastAPI(
     title="Bank Policy Assistant",
     description="Ask questions based on bank policy PDFs.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS (so Streamlit frontend can call backend)
@@ -24,16 +36,18 @@ app.add_middleware(
 )
 
 
-@app.get("/")
+@app.get("/", response_model=RootResponse)
 def root():
-    return {
-        "message": "Bank Policy Assistant API is running.",
-        "available_banks": retrieval_engine.available_banks,
-    }
+    return RootResponse(
+        message="Bank Policy Assistant API is running.",
+        available_banks=retrieval_engine.available_banks,
+    )
 
 
-@app.post("/ask", response_model=AnswerResponse)
-def ask_question(req: QuestionRequest):
+def _prepare_request(req: QuestionRequest) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """
+    Validate the question, resolve the bank and run retrieval.
+    """
     if not req.question.strip():
         raise HTTPException(status_code=400, detail="Question cannot be empty.")
 
@@ -64,14 +78,13 @@ def ask_question(req: QuestionRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-    # Generate answer with LLM
-    answer_data = generate_answer(
-        question=req.question,
-        bank=bank,
-        session_id=req.session_id,
-        retrieved_docs=retrieved_docs,
-    )
+    return bank, retrieved_docs
+
 
+def _finish_answer(req: QuestionRequest, answer_data: Dict[str, Any]) -> AnswerResponse:
+    """
+    Record the turn in session history and map the answer to the response model.
+    """
     # Save to session history (so future Qs have context)
     session_store.add_message(
         req.session_id,
@@ -93,6 +106,7 @@ def ask_question(req: QuestionRequest):
             snippet=s.get("snippet", ""),
         )
         for s in answer_data["sources"]
+        if isinstance(s, dict)
     ]
 
     return AnswerResponse(
@@ -101,3 +115,48 @@ def ask_question(req: QuestionRequest):
         sources=sources_items,
         cost_saving_tips=answer_data["cost_saving_tips"],
     )
+
+
+@app.post("/ask", response_model=AnswerResponse)
+def ask_question(req: QuestionRequest):
+    bank, retrieved_docs = _prepare_request(req)
+
+    # Generate answer with LLM
+    answer_data = generate_answer(
+        question=req.question,
+        bank=bank,
+        session_id=req.session_id,
+        retrieved_docs=retrieved_docs,
+    )
+
+    return _finish_answer(req, answer_data)
+
+
+@app.post("/ask/stream", response_class=EventSourceResponse)
+def ask_question_stream(
+    req: QuestionRequest,
+    # A dependency so validation/retrieval errors become normal HTTP errors
+    # before the event stream starts
+    prepared: Tuple[Optional[str], List[Dict[str, Any]]] = Depends(_prepare_request),
+):
+    """
+    Same as /ask, but streams Server-Sent Events while the LLM is generating:
+    "partial" events carry the top-level answer fields the model has fully
+    written so far (the field still being generated is left out), and a
+    final "answer" event carries the full AnswerResponse. If generation
+    fails mid-stream, the stream ends with an "error" event instead.
+    """
+    bank, retrieved_docs = prepared
+
+    try:
+        for event, data in stream_answer(
+            question=req.question,
+            bank=bank,
+            session_id=req.session_id,
+            retrieved_docs=retrieved_docs,
+        ):
+            if event == "answer":
+                data = _finish_answer(req, data)
+            yield ServerSentEvent(event=event, data=data)
+    except Exception as e:
+        yield ServerSentEvent(event="error", data={"detail": str(e)})
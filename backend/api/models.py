@@ -21,3 +21,8 @@ class AnswerResponse(BaseModel):
     steps: str             # Section 1B
     sources: List[SourceItem]  # Section 2
     cost_saving_tips: str  # Section 3
+
+
+class RootResponse(BaseModel):
+    message: str
+    available_banks: List[str]
@@ -1,11 +1,15 @@
 # backend/api/retrieval.py
 import os
-import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 
 import faiss
 import numpy as np
+import pyarrow as pa
+import torch
 from sentence_transformers import SentenceTransformer
 
 from config.settings import (
@@ -13,26 +17,74 @@ from config.settings import (
     EMBEDDING_MODEL_NAME,
     TOP_K_PER_INDEX,
     MAX_BANKS_WHEN_NO_BANK_SPECIFIED,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    HNSW_EF_SEARCH,
+    TORCH_NUM_THREADS,
 )
 
+torch.set_num_threads(TORCH_NUM_THREADS)
+try:
+    torch.set_num_interop_threads(1)
+except RuntimeError:
+    # Can only be set before torch starts any inter-op parallel work
+    pass
+
 
 class CorpusIndex:
-    def __init__(self, name: str, index: faiss.IndexFlatL2, chunks, metadatas):
+    def __init__(self, name: str, index: faiss.Index, table: pa.Table):
         self.name = name           # e.g. "common", "hdfc"
         self.index = index
-        self.chunks = chunks
-        self.metadatas = metadatas
+        self.table = table         # memory-mapped, one row per chunk
+        self.chunks = table.column("chunk")
+        # Each chunk joined with its same-document neighbors, built at ingest
+        self.merged_chunks = table.column("merged_chunk")
+
+        # Struct-of-arrays metadata: per-chunk int ids + deduplicated file names
+        source_col = table.column("source_file").combine_chunks()
+        if not pa.types.is_dictionary(source_col.type):
+            source_col = source_col.dictionary_encode()
+        self.source_files: List[str] = source_col.dictionary.to_pylist()
+        self.source_file_ids = source_col.indices.to_numpy().astype(
+            np.int32, copy=False
+        )
+        self.chunk_ids = (
+            table.column("chunk_id").to_numpy().astype(np.int32, copy=False)
+        )
 
 
 class RetrievalEngine:
     def __init__(self):
         self._corpora: Dict[str, CorpusIndex] = {}
+        # Lookup tables derived from _corpora once loading is done
+        self._corpora_lower: Dict[str, CorpusIndex] = {}
+        self._bank_corpora: List[CorpusIndex] = []
         self._embedding_model: Optional[SentenceTransformer] = None
+        # Whether the loaded tokenizer lowercases input (safe to fold cache keys)
+        self._tokenizer_lowercases = False
+        # normalized question -> query embedding (LRU order)
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
         self._load_all_corpora()
+        # faiss releases the GIL during search, so corpora can be searched concurrently
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self._corpora)),
+            thread_name_prefix="faiss-search",
+        )
 
     def _load_embedding_model(self):
         if self._embedding_model is None:
             self._embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+            self._tokenizer_lowercases = bool(
+                getattr(self._embedding_model.tokenizer, "do_lower_case", False)
+            )
+
+    def warmup(self):
+        """
+        Load the embedding model and run one forward pass, so the first
+        request does not pay the model-load latency.
+        """
+        self._load_embedding_model()
+        self._embedding_model.encode(["warmup"])
 
     def _load_all_corpora(self):
         if not STORAGE_DIR.exists():
@@ -44,7 +96,7 @@ class RetrievalEngine:
                 continue
 
             index_path = folder_path / "index.faiss"
-            meta_path = folder_path / "metadata.pkl"
+            meta_path = folder_path / "metadata.arrow"
 
             if not index_path.exists() or not meta_path.exists():
                 print(f"[WARN] Skipping corpus {name}, missing index/meta.")
@@ -52,95 +104,112 @@ class RetrievalEngine:
 
             print(f"[Retrieval] Loading corpus '{name}'")
             index = faiss.read_index(str(index_path))
-            with open(meta_path, "rb") as f:
-                meta = pickle.load(f)
+            if index.metric_type != faiss.METRIC_INNER_PRODUCT:
+                # Scores are ranked highest-first; an L2 index would invert that
+                print(
+                    f"[WARN] Skipping corpus {name}, index is not inner-product. "
+                    "Rebuild it with backend.ingest.build_indexes."
+                )
+                continue
+            if hasattr(index, "hnsw"):
+                index.hnsw.efSearch = HNSW_EF_SEARCH
+            # Zero-copy read: column buffers stay backed by the OS page cache
+            source = pa.memory_map(str(meta_path), "r")
+            table = pa.ipc.open_file(source).read_all()
 
             self._corpora[name] = CorpusIndex(
                 name=name,
                 index=index,
-                chunks=meta["chunks"],
-                metadatas=meta["metadatas"],
+                table=table,
             )
 
+        for name, c in self._corpora.items():
+            # setdefault: first folder wins if names differ only by case
+            self._corpora_lower.setdefault(name.lower(), c)
+        self._bank_corpora = [
+            c for name, c in self._corpora.items() if name.lower() != "common"
+        ]
+
         print(f"[Retrieval] Loaded corpora: {list(self._corpora.keys())}")
 
     @property
     def available_banks(self) -> List[str]:
         # All corpora except "common" are banks
-        return [name for name in self._corpora.keys() if name.lower() != "common"]
+        return [c.name for c in self._bank_corpora]
 
     def _encode_query(self, text: str) -> np.ndarray:
+        """
+        Encode a question, reusing the embedding of a previously seen question.
+
+        The key has whitespace collapsed, and is lowercased only when the
+        loaded tokenizer lowercases anyway, so it never changes the embedding.
+        """
         self._load_embedding_model()
+        key = " ".join(text.split())
+        if self._tokenizer_lowercases:
+            key = key.lower()
+
+        with self._query_cache_lock:
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                self._query_cache.move_to_end(key)
+                return cached
+
         emb = self._embedding_model.encode([text])
-        return np.asarray(emb).astype("float32")
+        emb = np.asarray(emb).astype("float32")
+        # Indexes store L2-normalized embeddings (cosine geometry)
+        faiss.normalize_L2(emb)
+
+        with self._query_cache_lock:
+            self._query_cache[key] = emb
+            self._query_cache.move_to_end(key)
+            while len(self._query_cache) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return emb
 
     def _search_single_corpus(
         self,
         corpus: CorpusIndex,
         query_embedding: np.ndarray,
         top_k: int,
-    ) -> List[Dict[str, Any]]:
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (cosine scores, chunk indices) for one corpus, best first,
+        dropping empty slots.
+        """
         distances, indices = corpus.index.search(query_embedding, top_k)
         distances = distances[0]
         indices = indices[0]
 
-        results: List[Dict[str, Any]] = []
-        for dist, idx in zip(distances, indices):
-            if idx == -1:
-                continue
-            meta = corpus.metadatas[idx]
-            chunk_text = corpus.chunks[idx]
-
-            # Merge with neighbors (to repair cut text)
-            merged_text = self._merge_neighbors(corpus, idx)
-
-            score = float(1 / (1 + dist))  # smaller distance -> higher score
-            results.append(
-                {
-                    "score": score,
-                    "bank": corpus.name,
-                    "document_name": meta.get("source_file", "unknown"),
-                    "chunk_id": meta.get("chunk_id", int(idx)),
-                    "raw_chunk": chunk_text,
-                    "merged_text": merged_text,
-                }
-            )
-        return results
+        found = indices != -1
+        # Inner product over normalized vectors is already cosine, highest first
+        return distances[found], indices[found]
 
-    def _merge_neighbors(self, corpus: CorpusIndex, idx: int) -> str:
+    def _build_result(
+        self,
+        corpus: CorpusIndex,
+        idx: int,
+        score: float,
+    ) -> Dict[str, Any]:
+        return {
+            "score": score,
+            "bank": corpus.name,
+            "document_name": corpus.source_files[corpus.source_file_ids[idx]],
+            "chunk_id": int(corpus.chunk_ids[idx]),
+            "raw_chunk": corpus.chunks[idx].as_py(),
+            "merged_text": corpus.merged_chunks[idx].as_py(),
+        }
+
+    @staticmethod
+    def _top_k_desc(scores: np.ndarray, k: int) -> np.ndarray:
         """
-        Merge current chunk with previous and next if same document.
-        This helps repair cut-off sentences.
+        Positions of the k highest scores, highest first (ties keep input order).
         """
-        current_meta = corpus.metadatas[idx]
-        current_file = current_meta.get("source_file", None)
-        current_chunk_id = current_meta.get("chunk_id", None)
-
-        texts = []
-
-        # Previous
-        if idx - 1 >= 0:
-            prev_meta = corpus.metadatas[idx - 1]
-            if (
-                prev_meta.get("source_file") == current_file
-                and prev_meta.get("chunk_id") == current_chunk_id - 1
-            ):
-                texts.append(corpus.chunks[idx - 1])
-
-        # Current
-        texts.append(corpus.chunks[idx])
-
-        # Next
-        if idx + 1 < len(corpus.chunks):
-            next_meta = corpus.metadatas[idx + 1]
-            if (
-                next_meta.get("source_file") == current_file
-                and next_meta.get("chunk_id") == current_chunk_id + 1
-            ):
-                texts.append(corpus.chunks[idx + 1])
-
-        merged = "\n".join(texts)
-        return merged
+        if k < len(scores):
+            candidates = np.sort(np.argpartition(-scores, k)[:k])
+        else:
+            candidates = np.arange(len(scores))
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
 
     def retrieve(
         self,
@@ -166,13 +235,7 @@ class RetrievalEngine:
         common_corpus = self._corpora.get("common")
         if bank:
             # Specific bank + common
-            bank_key = bank.lower()
-            # corpora keys are folder names, so assume they are stored lowercase
-            bank_corpus = None
-            for name, c in self._corpora.items():
-                if name.lower() == bank_key:
-                    bank_corpus = c
-                    break
+            bank_corpus = self._corpora_lower.get(bank.lower())
 
             if bank_corpus:
                 corpora_to_search.append(bank_corpus)
@@ -182,57 +245,58 @@ class RetrievalEngine:
             # No bank specified: search common + all banks
             if common_corpus:
                 corpora_to_search.append(common_corpus)
-            for name, c in self._corpora.items():
-                if name.lower() == "common":
-                    continue
-                corpora_to_search.append(c)
-
-        all_results: List[Dict[str, Any]] = []
-        for corpus in corpora_to_search:
-            corpus_results = self._search_single_corpus(
-                corpus, query_emb, top_k_per_index
+            corpora_to_search.extend(self._bank_corpora)
+
+        # map() keeps corpus order, so ties sort the same as a serial search
+        per_corpus = list(
+            self._executor.map(
+                lambda corpus: self._search_single_corpus(
+                    corpus, query_emb, top_k_per_index
+                ),
+                corpora_to_search,
             )
-            all_results.extend(corpus_results)
+        )
+        if not per_corpus:
+            return []
 
-        # Sort by score DESC
-        all_results.sort(key=lambda r: r["score"], reverse=True)
+        # Flatten into parallel arrays: score, owning corpus, chunk index
+        counts = np.array([len(idx) for _, idx in per_corpus])
+        scores = np.concatenate([sc for sc, _ in per_corpus])
+        chunk_idx = np.concatenate([idx for _, idx in per_corpus])
+        corpus_pos = np.repeat(np.arange(len(per_corpus)), counts)
 
         if bank:
             # We only need top N overall if specific bank
-            return all_results[: top_k_per_index * len(corpora_to_search)]
-
-        # No bank: we want:
-        # - common docs, plus
-        # - up to MAX_BANKS_WHEN_NO_BANK_SPECIFIED banks
-        # We'll keep best common chunks, and best from top few banks.
-        common_results = [r for r in all_results if r["bank"].lower() == "common"]
-        other_results = [r for r in all_results if r["bank"].lower() != "common"]
-
-        # Group other_results by bank
-        bank_to_results: Dict[str, List[Dict[str, Any]]] = {}
-        for r in other_results:
-            bank_to_results.setdefault(r["bank"], []).append(r)
-
-        # Sort banks by best score
-        bank_scores: List[Tuple[str, float]] = []
-        for bank_name, rs in bank_to_results.items():
-            best_score = max(r["score"] for r in rs)
-            bank_scores.append((bank_name, best_score))
-        bank_scores.sort(key=lambda x: x[1], reverse=True)
-
-        selected_banks = [
-            name for name, _ in bank_scores[:MAX_BANKS_WHEN_NO_BANK_SPECIFIED]
-        ]
-
-        filtered_results: List[Dict[str, Any]] = []
-        filtered_results.extend(common_results[: top_k_per_index])
-
-        for b in selected_banks:
-            filtered_results.extend(bank_to_results[b][:top_k_per_index])
+            keep = self._top_k_desc(
+                scores, top_k_per_index * len(corpora_to_search)
+            )
+        else:
+            # No bank: we want:
+            # - common docs, plus
+            # - up to MAX_BANKS_WHEN_NO_BANK_SPECIFIED banks
+            # Each corpus already returned at most top_k_per_index hits, so we
+            # only need to pick which banks survive, ranked by their best score.
+            is_common = np.array(
+                [c.name.lower() == "common" for c in corpora_to_search]
+            )
+            ranked = np.flatnonzero(~is_common & (counts > 0))
+            if len(ranked):
+                offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+                best = np.maximum.reduceat(scores, offsets[ranked])
+                ranked = ranked[np.argsort(-best, kind="stable")]
+            selected = np.concatenate(
+                (np.flatnonzero(is_common), ranked[:MAX_BANKS_WHEN_NO_BANK_SPECIFIED])
+            )
 
-        # Sort again by score
-        filtered_results.sort(key=lambda r: r["score"], reverse=True)
-        return filtered_results
+            survivors = np.flatnonzero(np.isin(corpus_pos, selected))
+            keep = survivors[self._top_k_desc(scores[survivors], len(survivors))]
 
+        # Only materialize result dicts for the survivors
+        return [
+            self._build_result(
+                corpora_to_search[corpus_pos[i]], int(chunk_idx[i]), float(scores[i])
+            )
+            for i in keep
+        ]
 
 retrieval_engine = RetrievalEngine()
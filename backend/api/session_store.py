@@ -1,22 +1,48 @@
 # backend/api/session_store.py
+import threading
 from typing import Dict, Any, List
 
+from cachetools import TTLCache
+
+from config.settings import (
+    MAX_SESSIONS,
+    SESSION_TTL_SECONDS,
+    MAX_SESSION_HISTORY,
+)
+
 
 class SessionStore:
     """
     Very simple in-memory session store.
 
+    Sessions expire after SESSION_TTL_SECONDS of inactivity, at most
+    MAX_SESSIONS are kept (least recently used are dropped first), and each
+    history is capped to the last MAX_SESSION_HISTORY messages.
+
     In real production, replace with Redis/DB.
     """
 
     def __init__(self):
         # session_id -> {"history": [...], "bank": str | None}
-        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._sessions: TTLCache = TTLCache(
+            maxsize=MAX_SESSIONS, ttl=SESSION_TTL_SECONDS
+        )
+        # TTLCache is not thread-safe, and FastAPI runs sync endpoints in a
+        # thread pool. Every operation here is O(1), so one lock is enough.
+        self._lock = threading.Lock()
+
+    def _get_session(self, session_id: str) -> Dict[str, Any]:
+        # Caller must hold self._lock
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = {"history": [], "bank": None}
+        # Re-assign so the TTL slides with activity
+        self._sessions[session_id] = session
+        return session
 
     def get_session(self, session_id: str) -> Dict[str, Any]:
-        if session_id not in self._sessions:
-            self._sessions[session_id] = {"history": [], "bank": None}
-        return self._sessions[session_id]
+        with self._lock:
+            return self._get_session(session_id)
 
     def add_message(
         self,
@@ -24,18 +50,22 @@ class SessionStore:
         role: str,
         content: str,
     ):
-        session = self.get_session(session_id)
-        session["history"].append({"role": role, "content": content})
+        with self._lock:
+            history = self._get_session(session_id)["history"]
+            history.append({"role": role, "content": content})
+            del history[:-MAX_SESSION_HISTORY]
 
     def get_history(self, session_id: str) -> List[Dict[str, str]]:
-        return self.get_session(session_id)["history"]
+        with self._lock:
+            return list(self._get_session(session_id)["history"])
 
     def set_bank(self, session_id: str, bank: str | None):
-        session = self.get_session(session_id)
-        session["bank"] = bank
+        with self._lock:
+            self._get_session(session_id)["bank"] = bank
 
     def get_bank(self, session_id: str) -> str | None:
-        return self.get_session(session_id)["bank"]
+        with self._lock:
+            return self._get_session(session_id)["bank"]
 
 
 session_store = SessionStore()
@@ -1,77 +1,108 @@
 # backend/ingest/build_indexes.py
 import os
-import pickle
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Any
 
 import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
+import pyarrow as pa
 
 from backend.ingest.config import (
     BASE_DATA_DIR,
     BASE_STORAGE_DIR,
     EMBEDDING_MODEL,
+    DEFAULT_EMBEDDING_BATCH_SIZE,
     DEFAULT_CHUNK_SIZE,
     DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_HNSW_M,
+    DEFAULT_HNSW_EF_CONSTRUCTION,
 )
-from backend.ingest.pdf_utils import read_pdf_text, chunk_text
+from backend.ingest.pdf_utils import process_pdf
 
 
 def build_corpus_for_folder(folder_name: str) -> Dict[str, Any]:
     """
-    Build chunks + metadatas for one corpus (e.g. common, hdfc, sbi).
+    Build chunks + merged chunks + metadatas for one corpus (e.g. common, hdfc, sbi).
+
+    PDFs are parsed in parallel across processes; results keep listing order.
     """
     data_folder = BASE_DATA_DIR / folder_name
     if not data_folder.exists():
         print(f"[WARN] Data folder does not exist: {data_folder}")
-        return {"chunks": [], "metadatas": []}
+        return {"chunks": [], "merged_chunks": [], "metadatas": []}
+
+    pdf_paths = [
+        data_folder / filename
+        for filename in os.listdir(data_folder)
+        if filename.lower().endswith(".pdf")
+    ]
 
     all_chunks: List[str] = []
+    all_merged_chunks: List[str] = []
     all_metadatas: List[Dict[str, Any]] = []
 
-    for filename in os.listdir(data_folder):
-        if not filename.lower().endswith(".pdf"):
-            continue
-
-        pdf_path = data_folder / filename
-        print(f"[{folder_name}] Reading: {pdf_path}")
-        text = read_pdf_text(pdf_path)
-
-        chunks = chunk_text(
-            text=text,
-            chunk_size=DEFAULT_CHUNK_SIZE,
-            overlap=DEFAULT_CHUNK_OVERLAP,
-        )
-
-        for i, chunk in enumerate(chunks):
-            all_chunks.append(chunk)
-            all_metadatas.append(
-                {
-                    "source_file": filename,
-                    "chunk_id": i,
-                    "folder": folder_name,
-                }
-            )
+    if pdf_paths:
+        n = len(pdf_paths)
+        with ProcessPoolExecutor(max_workers=min(n, os.cpu_count() or 1)) as ex:
+            for chunks, merged_chunks, metadatas in ex.map(
+                process_pdf,
+                pdf_paths,
+                [DEFAULT_CHUNK_SIZE] * n,
+                [DEFAULT_CHUNK_OVERLAP] * n,
+                [folder_name] * n,
+            ):
+                all_chunks.extend(chunks)
+                all_merged_chunks.extend(merged_chunks)
+                all_metadatas.extend(metadatas)
 
     print(f"[{folder_name}] Total chunks: {len(all_chunks)}")
-    return {"chunks": all_chunks, "metadatas": all_metadatas}
+    return {
+        "chunks": all_chunks,
+        "merged_chunks": all_merged_chunks,
+        "metadatas": all_metadatas,
+    }
 
 
-def build_index(chunks: List[str], model_name: str) -> faiss.IndexFlatL2:
-    """Create embeddings and FAISS index."""
+def build_index(chunks: List[str], model_name: str) -> faiss.Index:
+    """
+    Create embeddings and an HNSW FAISS index with 8-bit scalar-quantized storage.
+
+    Embeddings are L2-normalized and the index uses inner product, so search
+    returns cosine similarity directly.
+    """
     if not chunks:
         raise ValueError("No chunks to index.")
 
-    print(f"Loading embedding model: {model_name}")
-    model = SentenceTransformer(model_name)
+    # Imported here, not at module level: PDF-parsing workers started with
+    # spawn re-import this (main) module and should not pay for torch.
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    print(f"Loading embedding model: {model_name} ({device})")
+    model = SentenceTransformer(model_name, device=device)
+    if device == "cuda":
+        model.half()
 
     print("Encoding chunks...")
-    embeddings = model.encode(chunks, show_progress_bar=True)
-    embeddings = np.asarray(embeddings).astype("float32")
+    embeddings = model.encode(
+        chunks,
+        batch_size=DEFAULT_EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=True,
+    ).astype("float32", copy=False)
 
     dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
+    index = faiss.IndexHNSWSQ(
+        dim,
+        faiss.ScalarQuantizer.QT_8bit,
+        DEFAULT_HNSW_M,
+        faiss.METRIC_INNER_PRODUCT,
+    )
+    index.hnsw.efConstruction = DEFAULT_HNSW_EF_CONSTRUCTION
+    # The scalar quantizer learns per-dimension ranges before vectors can be added
+    index.train(embeddings)
     index.add(embeddings)
 
     return index
@@ -79,8 +110,9 @@ def build_index(chunks: List[str], model_name: str) -> faiss.IndexFlatL2:
 
 def save_index_and_meta(
     folder_name: str,
-    index: faiss.IndexFlatL2,
+    index: faiss.Index,
     chunks: List[str],
+    merged_chunks: List[str],
     metadatas: List[Dict[str, Any]],
 ):
     """
@@ -90,20 +122,31 @@ def save_index_and_meta(
     storage_folder.mkdir(parents=True, exist_ok=True)
 
     index_path = storage_folder / "index.faiss"
-    meta_path = storage_folder / "metadata.pkl"
+    meta_path = storage_folder / "metadata.arrow"
 
     print(f"[{folder_name}] Saving FAISS index -> {index_path}")
     faiss.write_index(index, str(index_path))
 
+    # One row per chunk, stored as an Arrow IPC file so it can be memory-mapped
+    table = pa.table(
+        {
+            "chunk": pa.array(chunks, type=pa.string()),
+            "merged_chunk": pa.array(merged_chunks, type=pa.string()),
+            # Dictionary-encoded: int32 file ids plus a deduplicated name table
+            "source_file": pa.array(
+                [m["source_file"] for m in metadatas], type=pa.string()
+            ).dictionary_encode(),
+            "chunk_id": pa.array(
+                [m["chunk_id"] for m in metadatas], type=pa.int32()
+            ),
+            "folder": pa.array([m["folder"] for m in metadatas], type=pa.string()),
+        }
+    )
+
     print(f"[{folder_name}] Saving metadata -> {meta_path}")
-    with open(meta_path, "wb") as f:
-        pickle.dump(
-            {
-                "chunks": chunks,
-                "metadatas": metadatas,
-            },
-            f,
-        )
+    with pa.OSFile(str(meta_path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
 
 
 def main():
@@ -126,6 +169,7 @@ def main():
         print(f"\n=== Building corpus for folder: {folder} ===")
         corpus = build_corpus_for_folder(folder)
         chunks = corpus["chunks"]
+        merged_chunks = corpus["merged_chunks"]
         metadatas = corpus["metadatas"]
 
         if not chunks:
@@ -133,7 +177,7 @@ def main():
             continue
 
         index = build_index(chunks, EMBEDDING_MODEL)
-        save_index_and_meta(folder, index, chunks, metadatas)
+        save_index_and_meta(folder, index, chunks, merged_chunks, metadatas)
 
     print("\nAll indexes built.")
 
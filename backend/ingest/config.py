@@ -4,13 +4,20 @@ from config.settings import (
     DATA_DIR,
     STORAGE_DIR,
     EMBEDDING_MODEL_NAME,
+    EMBEDDING_BATCH_SIZE,
     CHUNK_SIZE,
     CHUNK_OVERLAP,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
 )
 
 BASE_DATA_DIR = DATA_DIR
 BASE_STORAGE_DIR = STORAGE_DIR
 
 EMBEDDING_MODEL = EMBEDDING_MODEL_NAME
+DEFAULT_EMBEDDING_BATCH_SIZE = EMBEDDING_BATCH_SIZE
 DEFAULT_CHUNK_SIZE = CHUNK_SIZE
 DEFAULT_CHUNK_OVERLAP = CHUNK_OVERLAP
+
+DEFAULT_HNSW_M = HNSW_M
+DEFAULT_HNSW_EF_CONSTRUCTION = HNSW_EF_CONSTRUCTION
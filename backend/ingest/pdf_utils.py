@@ -1,6 +1,8 @@
 # backend/ingest/pdf_utils.py
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
 from pypdf import PdfReader
 
 
@@ -20,15 +22,50 @@ def chunk_text(
     overlap: int,
 ) -> List[str]:
     """Split text into overlapping character chunks."""
-    chunks: List[str] = []
-    start = 0
-    text_length = len(text)
-
-    while start < text_length:
-        end = start + chunk_size
-        chunk = text[start:end]
-        if chunk.strip():
-            chunks.append(chunk.strip())
-        start += chunk_size - overlap
-
-    return chunks
+    step = chunk_size - overlap
+    if step <= 0:
+        raise ValueError("chunk_size must be greater than overlap.")
+
+    # All window offsets at once; slicing clamps ends past len(text)
+    starts = np.arange(0, len(text), step).tolist()
+    chunks = [text[start : start + chunk_size].strip() for start in starts]
+    return [chunk for chunk in chunks if chunk]
+
+
+def process_pdf(
+    pdf_path: Path,
+    chunk_size: int,
+    overlap: int,
+    folder_name: str,
+) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """
+    Read and chunk a single PDF.
+
+    Lives here, away from the torch/faiss imports in build_indexes, so process
+    pool workers started with spawn only have to import pypdf and numpy.
+
+    Also returns each chunk merged with its previous and next chunk, which
+    repairs sentences cut at chunk boundaries.
+    """
+    print(f"[{folder_name}] Reading: {pdf_path}")
+    text = read_pdf_text(pdf_path)
+
+    chunks = chunk_text(
+        text=text,
+        chunk_size=chunk_size,
+        overlap=overlap,
+    )
+
+    merged_chunks = [
+        "\n".join(chunks[max(i - 1, 0) : i + 2]) for i in range(len(chunks))
+    ]
+
+    metadatas = [
+        {
+            "source_file": pdf_path.name,
+            "chunk_id": i,
+            "folder": folder_name,
+        }
+        for i in range(len(chunks))
+    ]
+    return chunks, merged_chunks, metadatas
@@ -15,6 +15,9 @@ LOGS_DIR = BASE_DIR / "logs"
 
 # Embeddings model
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = 256  # chunks per encode batch during ingest
+# CPU threads for query encoding (keeps torch from contending with the API workers)
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", min(4, os.cpu_count() or 1)))
 
 # LLM (OpenAI) settings
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "sk-xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx")
@@ -31,3 +34,16 @@ CHUNK_OVERLAP = 200    # characters
 # Retrieval config
 TOP_K_PER_INDEX = 5
 MAX_BANKS_WHEN_NO_BANK_SPECIFIED = 5
+
+# FAISS HNSW index config
+HNSW_M = 32                # graph neighbors per node
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Query embedding cache (exact match on normalized question text)
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# Session store config
+MAX_SESSIONS = 10_000
+SESSION_TTL_SECONDS = 3600
+MAX_SESSION_HISTORY = 20   # messages kept per session (user + assistant)
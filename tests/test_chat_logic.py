@@ -0,0 +1,74 @@
+# tests/test_chat_logic.py
+from types import SimpleNamespace
+
+import orjson
+
+from backend.api import chat_logic
+from backend.api.chat_logic import _shape_answer, safe_parse_llm_json, stream_answer
+
+
+def test_parses_fenced_json():
+    raw = '```json\n{"summary": "ok", "steps": "", "sources": [], "cost_saving_tips": ""}\n```'
+    assert safe_parse_llm_json(raw)["summary"] == "ok"
+
+
+def test_strips_prose_around_object():
+    raw = 'Here you go: {"summary": "Fee is {x}", "steps": "1. a"} Hope this helps!'
+    assert safe_parse_llm_json(raw) == {"summary": "Fee is {x}", "steps": "1. a"}
+
+
+def test_truncated_output_with_brace_inside_string():
+    # The last "}" is inside a string value; the tail must still be recovered
+    raw = (
+        '{"summary": "Fee is {x}", '
+        '"steps": "1. Visit branch (form {A}) and submit documents", '
+        '"sources": [], "cost_saving_tips": "Use online'
+    )
+    assert safe_parse_llm_json(raw) == {
+        "summary": "Fee is {x}",
+        "steps": "1. Visit branch (form {A}) and submit documents",
+        "sources": [],
+        "cost_saving_tips": "Use online",
+    }
+
+
+def test_unparseable_falls_back_to_summary():
+    parsed = safe_parse_llm_json("no json here")
+    assert parsed["summary"] == "no json here"
+    assert parsed["sources"] == []
+
+
+def test_non_object_json_falls_back_to_summary():
+    for raw in ['"text"', "[1, 2]", "42", "null"]:
+        parsed = safe_parse_llm_json(raw)
+        assert parsed["summary"] == raw
+        assert parsed["sources"] == []
+
+
+def test_stream_partials_only_carry_completed_fields(monkeypatch):
+    answer = {
+        "summary": "Fee is {x}",
+        "steps": "1. Visit branch",
+        "sources": [{"bank": "sbi", "document_name": "d.pdf", "snippet": "s"}],
+        "cost_saving_tips": "Use online banking",
+    }
+    raw = orjson.dumps(answer).decode()
+
+    def fake_stream(**kwargs):
+        for i in range(0, len(raw), 5):
+            yield SimpleNamespace(text=raw[i : i + 5])
+
+    monkeypatch.setattr(
+        chat_logic,
+        "client",
+        SimpleNamespace(models=SimpleNamespace(generate_content_stream=fake_stream)),
+    )
+
+    events = list(stream_answer("q", None, "stream-test", []))
+
+    partials = [data for event, data in events if event == "partial"]
+    assert partials
+    for partial in partials:
+        # Every emitted field is already in its final form
+        assert partial == {key: answer[key] for key in partial}
+    assert events[-1] == ("answer", _shape_answer(answer))
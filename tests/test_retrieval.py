@@ -0,0 +1,121 @@
+# tests/test_retrieval.py
+import tempfile
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pyarrow as pa
+import pytest
+
+import config.settings
+
+# retrieval builds its engine at import time; point it at an empty storage dir
+config.settings.STORAGE_DIR = Path(tempfile.mkdtemp())
+
+from backend.api import retrieval  # noqa: E402
+from backend.api.retrieval import CorpusIndex, RetrievalEngine  # noqa: E402
+
+
+class FakeIndex:
+    """Returns preset inner-product scores (highest first), padded like FAISS."""
+
+    metric_type = faiss.METRIC_INNER_PRODUCT
+
+    def __init__(self, scores):
+        self.scores = scores
+
+    def search(self, query, k):
+        distances = np.full((1, k), -np.inf, dtype="float32")
+        indices = np.full((1, k), -1, dtype="int64")
+        n = min(k, len(self.scores))
+        distances[0, :n] = self.scores[:n]
+        indices[0, :n] = np.arange(n)
+        return distances, indices
+
+
+def make_corpus(name, scores):
+    n = len(scores)
+    texts = pa.array([f"{name}-{i}" for i in range(n)], type=pa.string())
+    table = pa.table(
+        {
+            "chunk": texts,
+            "merged_chunk": texts,
+            "source_file": pa.array(
+                [f"{name}.pdf"] * n, type=pa.string()
+            ).dictionary_encode(),
+            "chunk_id": pa.array(list(range(n)), type=pa.int32()),
+            "folder": pa.array([name] * n, type=pa.string()),
+        }
+    )
+    return CorpusIndex(name=name, index=FakeIndex(scores), table=table)
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    # Folder order matters for tie-breaking; "empty" has no hits at all.
+    # b4 and b6 tie on best score 0.6, and b2 and b3 tie on 0.7.
+    corpora = [
+        make_corpus("common", [0.9, 0.5]),
+        make_corpus("b1", [0.8, 0.3]),
+        make_corpus("empty", []),
+        make_corpus("b2", [0.7]),
+        make_corpus("b3", [0.7]),
+        make_corpus("b4", [0.6, 0.6]),
+        make_corpus("b5", [0.95]),
+        make_corpus("b6", [0.6]),
+    ]
+    eng = RetrievalEngine()
+    eng._corpora = {c.name: c for c in corpora}
+    eng._corpora_lower = {c.name.lower(): c for c in corpora}
+    eng._bank_corpora = [c for c in corpora if c.name != "common"]
+    monkeypatch.setattr(
+        eng, "_encode_query", lambda text: np.zeros((1, 4), dtype="float32")
+    )
+    return eng
+
+
+def hits(results):
+    return [(r["bank"], r["chunk_id"]) for r in results]
+
+
+def test_no_bank_keeps_common_and_top_banks(engine):
+    # 6 banks with hits but only 5 may be selected; b6 loses its tie with b4
+    assert retrieval.MAX_BANKS_WHEN_NO_BANK_SPECIFIED == 5
+    results = engine.retrieve("q", bank=None, top_k_per_index=5)
+    assert hits(results) == [
+        ("b5", 0),
+        ("common", 0),
+        ("b1", 0),
+        ("b2", 0),
+        ("b3", 0),
+        ("b4", 0),
+        ("b4", 1),
+        ("common", 1),
+        ("b1", 1),
+    ]
+    assert [r["score"] for r in results] == pytest.approx(
+        [0.95, 0.9, 0.8, 0.7, 0.7, 0.6, 0.6, 0.5, 0.3]
+    )
+
+
+def test_specific_bank_is_case_insensitive(engine):
+    results = engine.retrieve("q", bank="B4", top_k_per_index=5)
+    # b4's tied hits keep their search order
+    assert hits(results) == [("common", 0), ("b4", 0), ("b4", 1), ("common", 1)]
+
+
+def test_specific_empty_bank_returns_common_only(engine):
+    results = engine.retrieve("q", bank="empty", top_k_per_index=5)
+    assert hits(results) == [("common", 0), ("common", 1)]
+
+
+def test_result_fields(engine):
+    result = engine.retrieve("q", bank="b5", top_k_per_index=1)[0]
+    assert result == {
+        "score": pytest.approx(0.95),
+        "bank": "b5",
+        "document_name": "b5.pdf",
+        "chunk_id": 0,
+        "raw_chunk": "b5-0",
+        "merged_text": "b5-0",
+    }